@@ -1,15 +1,13 @@
 import streamlit as st
 import os
-from langchain.globals import set_verbose
-from langchain_groq import ChatGroq
-from langchain_google_genai import ChatGoogleGenerativeAI
+import asyncio
+import gc
+import re
 from dotenv import load_dotenv
-from docx import Document
-from docx.shared import Pt, Inches, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING
-from docx.enum.style import WD_STYLE_TYPE
 from datetime import datetime
+from collections import deque
 import io
+from xml.sax.saxutils import escape
 
 # Set theme and configuration
 st.set_page_config(
@@ -40,12 +38,24 @@ if 'autosave' not in st.session_state:
     st.session_state.autosave = True
 if 'doc_sections' not in st.session_state:
     st.session_state.doc_sections = {}
+if 'parsed_sections' not in st.session_state:
+    st.session_state.parsed_sections = {}
 if 'metadata' not in st.session_state:
     st.session_state.metadata = {}
 if 'feedback_history' not in st.session_state:
-    st.session_state.feedback_history = []
+    st.session_state.feedback_history = deque(maxlen=50)
+if 'feedback_count' not in st.session_state:
+    st.session_state.feedback_count = 0
 if 'has_generated' not in st.session_state:
     st.session_state.has_generated = False
+if 'doc_obj' not in st.session_state:
+    st.session_state.doc_obj = None
+if 'doc_metadata' not in st.session_state:
+    st.session_state.doc_metadata = {}
+if 'doc_bytes' not in st.session_state:
+    st.session_state.doc_bytes = None
+if 'truncated_sections' not in st.session_state:
+    st.session_state.truncated_sections = set()
 
 # Sidebar configuration
 with st.sidebar:
@@ -57,19 +67,32 @@ with st.sidebar:
     )
     st.session_state.autosave = st.toggle("Auto-save", st.session_state.autosave)
 
-# Set verbosity
-set_verbose(False)
+# Models used for generation
+GROQ_MODEL = "openai/gpt-oss-120b"
+GOOGLE_MODEL = "gemini-2.5-flash"
 
-# Load environment variables
-load_dotenv()
+@st.cache_resource
+def get_clients():
+    """Initialize the provider SDK clients once and reuse their HTTP sessions across reruns"""
+    # Import the SDKs lazily to keep cold starts fast
+    from groq import Groq
+    from google import genai
+    
+    # Load environment variables
+    load_dotenv()
+    
+    # Load API keys
+    return (
+        Groq(api_key=os.getenv('GROQ_API_KEY')),
+        genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+    )
 
-# Load API keys
-groq_api_key = os.getenv('GROQ_API_KEY')
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
+def max_tokens_for(pages):
+    """Token cap for the given number of pages, with 30% headroom over ~500 words per page"""
+    return int(pages * 500 * 1.3 / 0.75)
 
-# Initialize AI models
-groq_model = ChatGroq(groq_api_key=groq_api_key, model_name="openai/gpt-oss-120b")
-google_model = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
+# Extra completion tokens for gpt-oss, whose reasoning counts against Groq's cap
+GROQ_REASONING_TOKENS = 1024
 
 # Define documentation sections with updated structure
 SECTIONS = {
@@ -86,8 +109,44 @@ SECTIONS = {
     "REFERENCES": {"title": "REFERENCES", "pages": 1, "description": "Lists cited sources, books, research papers, and online materials."}
 }
 
+# Sections with generated content, excluding the cover page and contents built directly
+NON_CONTENT_SECTIONS = frozenset({'COVER_PAGE', 'CONTENTS'})
+CONTENT_SECTIONS = tuple((k, v) for k, v in SECTIONS.items() if k not in NON_CONTENT_SECTIONS)
+CONTENT_SECTION_KEYS = tuple(k for k, _ in CONTENT_SECTIONS)
+
+# Section-specific guidance for content generation
+SECTION_GUIDANCE = {
+    "CHAPTER_3": "Focus on hardware components like Arduino, sensors, and other electronic components. Describe their specifications and roles in detail.",
+    "CHAPTER_4": "Explain the programming approach, include pseudocode or algorithm descriptions (not actual code), and detail the software workflow.",
+    "LITERATURE_SURVEY": "Review at least 5-7 similar projects or related research papers, mentioning their approaches and results."
+}
+
+# Sentinels wrapping each section in a batched response
+SECTION_PATTERN = re.compile(r"<<<SECTION:(\w+)>>>(.*?)<<<END>>>", re.S)
+
+# Opening sentinel of a section in a partially streamed batched response
+SECTION_MARKER_PATTERN = re.compile(r"<<<SECTION:(\w+)>>>")
+
+# Markdown-style subsection heading, e.g. "### Component Analysis", and any text below it
+HEADING_PATTERN = re.compile(r"^(#+)[ \t]*([^\n]*)\n?(.*)", re.S)
+
+# Raw paragraph XML for fixed text, bypassing python-docx's per-paragraph overhead
+PARAGRAPH_XML = (
+    '<w:p xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+    '<w:pPr>{paragraph_props}</w:pPr>'
+    '<w:r><w:rPr>{run_props}</w:rPr><w:t xml:space="preserve">{text}</w:t></w:r>'
+    '</w:p>'
+)
+LINE_BREAK_XML = '</w:t><w:br/><w:t xml:space="preserve">'
+CENTER_ALIGN_XML = '<w:jc w:val="center"/>'
+ITALIC_XML = '<w:i/>'
+FONT_SIZE_12_XML = '<w:sz w:val="24"/>'
+
 def setup_document_styles(doc):
     """Set up professional document styles with updated formatting"""
+    from docx.shared import Pt, RGBColor
+    from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING
+    
     # Default paragraph style
     style = doc.styles['Normal']
     font = style.font
@@ -123,8 +182,24 @@ def setup_document_styles(doc):
         paragraph_format.border_bottom = True
         paragraph_format.border_top = True
 
+def append_paragraph_xml(doc, text, paragraph_props="", run_props=""):
+    """Append a single-run paragraph built directly from XML"""
+    from docx.oxml import parse_xml
+    
+    text = escape(text).replace("\n", LINE_BREAK_XML)
+    p = parse_xml(PARAGRAPH_XML.format(paragraph_props=paragraph_props, run_props=run_props, text=text))
+    
+    # Keep the section properties as the last element of the body
+    body = doc.element.body
+    if body.sectPr is not None:
+        body.sectPr.addprevious(p)
+    else:
+        body.append(p)
+
 def add_actual_toc(doc):
     """Add actual table of contents instead of placeholder"""
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    
     doc.add_heading("TABLE OF CONTENTS", 1)
     
     # Create a table for the TOC
@@ -150,11 +225,14 @@ def add_actual_toc(doc):
         row_index += 1
     
     # Add note about TOC
-    p = doc.add_paragraph()
-    p.add_run("\nNote: This is a simple table of contents. For a dynamic TOC in MS Word, replace this with Word's built-in TOC feature.").italic = True
+    append_paragraph_xml(doc, "\nNote: This is a simple table of contents. For a dynamic TOC in MS Word, replace this with Word's built-in TOC feature.", run_props=ITALIC_XML)
 
-def create_docx(metadata):
-    """Create a professionally formatted DOCX document with updated structure"""
+@st.cache_resource
+def get_template_bytes():
+    """Build the pre-styled empty template document once and return it as bytes"""
+    from docx import Document
+    from docx.shared import Inches
+    
     doc = Document()
     setup_document_styles(doc)
     
@@ -167,6 +245,71 @@ def create_docx(metadata):
         # Add page numbers by setting different first page
         section.different_first_page_header_footer = True
     
+    # Drop the legacy Word 2010 styles part; it is the largest part in the package
+    # and dominates compression time on every save, and Word rebuilds it when needed
+    for rId, rel in list(doc.part.rels.items()):
+        if rel.reltype.endswith('/stylesWithEffects'):
+            doc.part.drop_rel(rId)
+    
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+def parse_section(content):
+    """Split section content into ('h', level, text) and ('p', text) items"""
+    # Fix for Gemini model bullet points with "**X. Objective**" format
+    content = content.replace("**1. ", "### 1. ")
+    content = content.replace("**2. ", "### 2. ")
+    content = content.replace("**3. ", "### 3. ")
+    content = content.replace("**4. ", "### 4. ")
+    content = content.replace("**5. ", "### 5. ")
+    content = content.replace("**Objective ", "### Objective ")
+    content = content.replace("**Objectives ", "### Objectives ")
+    
+    items = []
+    for para in content.split('\n\n'):
+        para = para.strip()
+        if para:
+            match = HEADING_PATTERN.match(para)
+            if match:
+                # Handle subsection headings
+                # Only Heading 1-4 are styled, so deeper levels share Heading 4
+                level = len(match.group(1))
+                items.append(('h', min(level + 1, 4), match.group(2).strip().upper()))
+                # Text on the lines below the heading is a paragraph of its own
+                body = match.group(3).strip()
+                if body:
+                    items.append(('p', body))
+            elif para.startswith('**') and para.endswith('**'):
+                # Handle bold text that might be intended as a heading
+                text = para.strip('* \t\n')
+                items.append(('h', 2, text.upper()))
+            else:
+                # Regular paragraphs
+                items.append(('p', para))
+    return items
+
+def add_section_content(doc, items):
+    """Append a section's pre-parsed headings and paragraphs"""
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    
+    for kind, *rest in items:
+        if kind == 'h':
+            level, text = rest
+            subheading = doc.add_heading(text, level)
+            subheading.alignment = WD_ALIGN_PARAGRAPH.LEFT
+        else:
+            # Normal is already justified with 1.5 line spacing
+            doc.add_paragraph(rest[0])
+
+def create_docx(metadata, parsed_sections):
+    """Create a professionally formatted DOCX document with updated structure"""
+    from docx import Document
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    
+    # Start from the pre-styled template instead of rebuilding styles
+    doc = Document(io.BytesIO(get_template_bytes()))
+    
     # Cover Page
     cover = doc.add_heading(metadata.get('title', 'PROJECT DOCUMENTATION').upper(), 0)
     cover.alignment = WD_ALIGN_PARAGRAPH.CENTER
@@ -174,15 +317,10 @@ def create_docx(metadata):
     # Add metadata
     for field in ['author', 'institution', 'date']:
         if metadata.get(field):
-            p = doc.add_paragraph()
-            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            run = p.add_run(metadata[field].upper())
-            run.font.size = Pt(12)
+            append_paragraph_xml(doc, metadata[field].upper(), CENTER_ALIGN_XML, FONT_SIZE_12_XML)
     
     # Add space for image
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    p.add_run("[Space reserved for project image]")
+    append_paragraph_xml(doc, "[Space reserved for project image]", CENTER_ALIGN_XML)
     
     doc.add_page_break()
     
@@ -191,48 +329,17 @@ def create_docx(metadata):
     doc.add_page_break()
     
     # Add content sections with proper page breaks and borders
-    for section_key, section_info in SECTIONS.items():
-        # Skip cover page and contents as they're already added
-        if section_key in ['COVER_PAGE', 'CONTENTS']:
-            continue
-            
+    section_para_ranges = {}
+    for section_key, section_info in CONTENT_SECTIONS:
         # Add section heading
         heading = doc.add_heading(section_info['title'], 1)
         heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
         
         # Add section content
-        if section_key in st.session_state.doc_sections:
-            content = st.session_state.doc_sections[section_key]
-            
-            # Fix for Gemini model bullet points with "**X. Objective**" format
-            content = content.replace("**1. ", "### 1. ")
-            content = content.replace("**2. ", "### 2. ")
-            content = content.replace("**3. ", "### 3. ")
-            content = content.replace("**4. ", "### 4. ")
-            content = content.replace("**5. ", "### 5. ")
-            content = content.replace("**Objective ", "### Objective ")
-            content = content.replace("**Objectives ", "### Objectives ")
-            
-            paragraphs = content.split('\n\n')
-            
-            for para in paragraphs:
-                if para.strip():
-                    if para.strip().startswith('#'):
-                        # Handle subsection headings
-                        level = len(para.split()[0].strip('#'))
-                        text = ' '.join(para.split()[1:]).upper()
-                        subheading = doc.add_heading(text, level + 1)
-                        subheading.alignment = WD_ALIGN_PARAGRAPH.LEFT
-                    elif para.strip().startswith('**') and para.strip().endswith('**'):
-                        # Handle bold text that might be intended as a heading
-                        text = para.strip('* \t\n')
-                        subheading = doc.add_heading(text.upper(), 2)
-                        subheading.alignment = WD_ALIGN_PARAGRAPH.LEFT
-                    else:
-                        # Regular paragraphs
-                        p = doc.add_paragraph(para.strip())
-                        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-                        p.paragraph_format.line_spacing_rule = WD_LINE_SPACING.ONE_POINT_FIVE
+        start = len(doc.paragraphs)
+        if section_key in parsed_sections:
+            add_section_content(doc, parsed_sections[section_key])
+        section_para_ranges[section_key] = (start, len(doc.paragraphs))
         
         # Add page break after each section
         doc.add_page_break()
@@ -246,10 +353,278 @@ def create_docx(metadata):
     p.add_run("- {PAGE} -")
     p.add_run(" (Open in Word to see actual page numbers)")
     
-    # Save document
-    doc_path = "project_documentation.docx"
-    doc.save(doc_path)
-    return doc_path
+    # Save document in memory
+    save_docx(doc)
+    return doc, section_para_ranges
+
+def patch_section(doc, section_key, items, section_para_ranges):
+    """Replace a single section's content in an already built document"""
+    start, end = section_para_ranges[section_key]
+    paragraphs = doc.paragraphs
+    # The section heading sits right before its content
+    anchor = paragraphs[start - 1]._element
+    
+    # Remove the old section content
+    for p in paragraphs[start:end]:
+        p._element.getparent().remove(p._element)
+    
+    # Build the new content at the end of the body, then move it after the section heading
+    body_length = len(doc.paragraphs)
+    add_section_content(doc, items)
+    new_paragraphs = doc.paragraphs[body_length:]
+    for p in new_paragraphs:
+        anchor.addnext(p._element)
+        anchor = p._element
+    
+    # Shift the ranges of the sections that follow
+    delta = len(new_paragraphs) - (end - start)
+    section_para_ranges[section_key] = (start, start + len(new_paragraphs))
+    for key, (key_start, key_end) in section_para_ranges.items():
+        if key_start > start:
+            section_para_ranges[key] = (key_start + delta, key_end + delta)
+
+def save_docx(doc):
+    """Serialize the document in memory for downloading"""
+    buf = io.BytesIO()
+    doc.save(buf)
+    buf.seek(0)
+    st.session_state.doc_bytes = buf.getvalue()
+
+class TruncatedResponseError(RuntimeError):
+    """Raised when a model response is cut off at its token limit, carrying the partial text"""
+    def __init__(self, model_name, max_tokens, text):
+        super().__init__(f"{model_name} response was cut off at {max_tokens} tokens")
+        self.text = text
+
+def stream_completion(model_name, prompt, max_tokens, on_chunk=None):
+    """Stream a model response, passing each chunk of text to on_chunk as it arrives"""
+    groq_client, google_client = get_clients()
+    
+    # Opt into the lowest-latency settings each provider exposes: Groq's auto
+    # service tier with low reasoning effort, and Gemini without thinking
+    if model_name == GOOGLE_MODEL:
+        stream = google_client.models.generate_content_stream(
+            model=model_name,
+            contents=prompt,
+            config={"max_output_tokens": max_tokens, "thinking_config": {"thinking_budget": 0}}
+        )
+        pieces = ((chunk.text, chunk.candidates[0].finish_reason if chunk.candidates else None) for chunk in stream)
+    else:
+        stream = groq_client.chat.completions.create(
+            model=model_name,
+            messages=[{"role": "user", "content": prompt}],
+            max_completion_tokens=max_tokens + GROQ_REASONING_TOKENS,
+            service_tier="auto",
+            reasoning_effort="low",
+            stream=True
+        )
+        pieces = ((chunk.choices[0].delta.content, chunk.choices[0].finish_reason) for chunk in stream if chunk.choices)
+    
+    chunks = []
+    finish_reason = None
+    for text, reason in pieces:
+        finish_reason = reason or finish_reason
+        if text:
+            chunks.append(text)
+            if on_chunk:
+                on_chunk(text)
+    
+    # Fail on truncated output so cached callers never store a cut-off section
+    if finish_reason in ("length", "MAX_TOKENS"):
+        raise TruncatedResponseError(model_name, max_tokens, ''.join(chunks))
+    return ''.join(chunks)
+
+def render_previews(previews, placeholder):
+    """Render the partial text streamed so far for each section"""
+    parts = []
+    for key, chunks in list(previews.items()):
+        text = ''.join(chunks)
+        if key in SECTIONS:
+            parts.append(f"### {SECTIONS[key]['title']}\n\n{text}")
+        else:
+            # Show the batched response with its sentinels turned into headings
+            text = SECTION_MARKER_PATTERN.sub(lambda m: f"\n\n### {SECTIONS.get(m.group(1), {}).get('title', m.group(1))}\n\n", text)
+            parts.append(text.replace("<<<END>>>", ""))
+    placeholder.markdown('\n\n'.join(parts))
+
+async def with_stream_previews(awaitable, previews, placeholder):
+    """Await a generation task while rendering the text its worker threads stream into previews"""
+    # Cached functions cannot touch elements created outside them, so workers only
+    # append chunks to previews and the event loop renders them here
+    task = asyncio.ensure_future(awaitable)
+    while not task.done():
+        render_previews(previews, placeholder)
+        await asyncio.wait({task}, timeout=0.25)
+    placeholder.empty()
+    return task.result()
+
+def build_shared_prefix(abstract, technologies, objectives, components, project_type):
+    """Build the project context shared by every generation prompt"""
+    # Every prompt starts with exactly this text so Groq's prompt cache can reuse it
+    return f"""You are generating documentation sections for the following {project_type} project:
+    
+    Abstract: {abstract}
+    
+    Additional Context:
+    - Technologies: {technologies}
+    - Objectives: {objectives}
+    - Components: {components}
+    
+    General Requirements:
+    1. Use clear, straightforward explanations with appropriate technical depth
+    2. Organize content with clear sections and subsections
+    3. For headings, use markdown style with ### for subheadings (e.g., "### Component Analysis")
+    4. DO NOT use numbered bold headings like "**1. Objective**" - always use ### instead
+    5. Write in a professional academic style with proper citations where appropriate
+    6. Use proper paragraph breaks for readability
+    7. Focus on factual information that would be relevant to this type of project
+    8. For CHAPTER_2, include descriptions of block diagrams (not the diagrams themselves)
+    9. Make this content unique, avoiding generic templates
+    10. Ensure all content is technically accurate and plausible
+    
+    """
+
+@st.cache_data(ttl=24 * 3600, show_spinner=False)
+def generate_section(model_name, section_key, abstract, technologies, objectives, components, project_type, _on_chunk=None):
+    """Generate a single documentation section, cached on its inputs"""
+    section_info = SECTIONS[section_key]
+    
+    # Section-specific guidance
+    section_guidance = SECTION_GUIDANCE.get(section_key, "")
+    
+    prompt = build_shared_prefix(abstract, technologies, objectives, components, project_type) + f"""Generate the {section_info['title']} section.
+    
+    Section Purpose: {section_info.get('description', '')}
+    
+    Section Guidance: {section_guidance}
+    
+    Length: This section should be approximately {section_info['pages']} pages long (about {section_info['pages'] * 500} words)
+    """
+    
+    return stream_completion(model_name, prompt, max_tokens_for(section_info['pages']), _on_chunk)
+
+async def gen_section(section_key, model_name, context, semaphore, on_section_done=None, previews=None, on_section_truncated=None):
+    """Generate a single documentation section in a worker thread"""
+    # Limit concurrent requests to respect provider rate limits
+    async with semaphore:
+        try:
+            content = await asyncio.to_thread(
+                generate_section,
+                model_name,
+                section_key,
+                context['abstract'],
+                context['technologies'],
+                context['objectives'],
+                context['components'],
+                context['project_type'],
+                previews.setdefault(section_key, []).append if previews is not None else None
+            )
+        except TruncatedResponseError as e:
+            # Keep the uncached partial text so one long section does not fail the whole run
+            content = e.text
+            if on_section_truncated:
+                on_section_truncated(section_key)
+    
+    if on_section_done:
+        on_section_done(section_key)
+    return section_key, content
+
+async def gen_all_sections(context, section_keys, on_section_done=None, previews=None, on_section_truncated=None):
+    """Generate the given content sections concurrently"""
+    semaphore = asyncio.Semaphore(4)
+    
+    coros = []
+    for i, section_key in enumerate(section_keys):
+        # Use alternating models for different sections
+        model_name = GROQ_MODEL if i % 2 == 0 else GOOGLE_MODEL
+        coros.append(gen_section(section_key, model_name, context, semaphore, on_section_done, previews, on_section_truncated))
+    
+    return await asyncio.gather(*coros)
+
+@st.cache_data(ttl=24 * 3600, show_spinner=False)
+def gen_batched_sections(model_name, context, section_keys, _on_chunk=None):
+    """Generate the given content sections with a single batched prompt"""
+    # Describe every section once so the shared context is only sent once
+    section_list = "\n".join(
+        f"    {i}. [{key} | {SECTIONS[key]['title']} | {SECTIONS[key]['pages']} | "
+        f"{SECTIONS[key].get('description', '')} | {SECTION_GUIDANCE.get(key, '')}]"
+        for i, key in enumerate(section_keys, 1)
+    )
+    
+    prompt = build_shared_prefix(
+        context['abstract'],
+        context['technologies'],
+        context['objectives'],
+        context['components'],
+        context['project_type']
+    ) + f"""Generate the documentation sections listed below.
+    
+    Sections (format: [SECTION_KEY | title | pages | description | guidance]):
+{section_list}
+    
+    Output format:
+    Wrap each section exactly as shown below, using the SECTION_KEY from the list above:
+    <<<SECTION:SECTION_KEY>>>
+    section content
+    <<<END>>>
+    
+    Output every listed section, in order, each wrapped in its own sentinels.
+    Each section should be approximately its listed number of pages long (about 500 words per page).
+    """
+    
+    max_tokens = max_tokens_for(sum(SECTIONS[key]['pages'] for key in section_keys))
+    response = stream_completion(model_name, prompt, max_tokens, _on_chunk)
+    return split_batched_sections(response, section_keys)
+
+def split_batched_sections(response, section_keys):
+    """Extract the requested, complete sections from a batched response"""
+    # Keep only sections that were requested
+    return {
+        key: content.strip()
+        for key, content in SECTION_PATTERN.findall(response)
+        if key in section_keys and content.strip()
+    }
+
+@st.cache_data(ttl=24 * 3600, show_spinner=False)
+def refine_section(model_name, current, feedback, section_key, _on_chunk=None):
+    """Update a documentation section based on user feedback, cached on its inputs"""
+    prompt = f"""Update the following documentation section based on user feedback:
+    
+    Current content:
+    {current}
+    
+    User feedback:
+    {feedback}
+    
+    Section Purpose: {SECTIONS[section_key].get('description', '')}
+    
+    Requirements:
+    1. Maintain professional academic writing style
+    2. Implement the requested changes thoroughly
+    3. Keep the content within approximately {SECTIONS[section_key]['pages'] * 500} words
+    4. Ensure the text remains technically accurate
+    5. Use proper paragraph structure and organization
+    6. Ensure content flows logically
+    7. Use markdown style with ### for subheadings (not bold formatting like **Heading**)
+    8. Never use formats like "**1. Objective**" - use "### 1. Objective" instead
+    """
+    
+    # Batched sections can outgrow their own page budget, so size the cap to fit
+    # a rewrite of the current text as well
+    max_tokens = max(max_tokens_for(SECTIONS[section_key]['pages']), int(len(current.split()) * 1.3 / 0.75))
+    return stream_completion(model_name, prompt, max_tokens, _on_chunk)
+
+def render_download_button(key):
+    """Render the download button for the in-memory document"""
+    if st.session_state.get("doc_bytes"):
+        st.download_button(
+            label="📥 Download Documentation",
+            data=st.session_state.doc_bytes,
+            file_name="project_documentation.docx",
+            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            use_container_width=True,
+            key=key
+        )
 
 # Main UI layout
 def main():
@@ -259,15 +634,8 @@ def main():
         st.title("Advanced Project Documentation Generator")
 
     with nav_col3:
-        if st.session_state.has_generated and os.path.exists("project_documentation.docx"):
-            with open("project_documentation.docx", "rb") as file:
-                st.download_button(
-                    label="📥 Download Documentation",
-                    data=file,
-                    file_name="project_documentation.docx",
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                    use_container_width=True
-                )
+        if st.session_state.has_generated:
+            render_download_button("download_top")
 
     # Main layout
     col1, col2 = st.columns([2, 3])
@@ -275,16 +643,36 @@ def main():
     with col1:
         st.subheader("Project Information")
         
-        # Project metadata
-        with st.expander("Project Details", expanded=True):
-            project_title = st.text_input("Project Title", key="title")
-            author_name = st.text_input("Author Name", key="author")
-            institution = st.text_input("Institution Name", key="institution")
-            project_type = st.selectbox(
-                "Project Type",
-                ["Arduino-based", "Raspberry Pi-based", "IoT Project", "Embedded Systems", "Other"],
-                key="project_type"
+        # Batch the inputs so the script only reruns when they are saved
+        with st.form("project_info"):
+            # Project metadata
+            with st.expander("Project Details", expanded=True):
+                project_title = st.text_input("Project Title", key="title")
+                author_name = st.text_input("Author Name", key="author")
+                institution = st.text_input("Institution Name", key="institution")
+                project_type = st.selectbox(
+                    "Project Type",
+                    ["Arduino-based", "Raspberry Pi-based", "IoT Project", "Embedded Systems", "Other"],
+                    key="project_type"
+                )
+            
+            # Project abstract
+            st.markdown("### Project Abstract")
+            project_abstract = st.text_area(
+                "Enter your project abstract",
+                height=200,
+                help="Provide a comprehensive summary of your project"
             )
+            
+            # Project specifics to improve content generation
+            with st.expander("Additional Project Details (Improves Generation)"):
+                st.text_area("Key Technologies Used", placeholder="e.g., Arduino Uno, HC-05 Bluetooth, L298N Motor Driver", key="technologies")
+                st.text_area("Project Objectives", placeholder="List main objectives of your project", key="objectives")
+                st.text_area("Project Components", placeholder="List main hardware/software components", key="components")
+            
+            submitted = st.form_submit_button("Save")
+        
+        if submitted:
             st.session_state.metadata = {
                 "title": project_title,
                 "author": author_name,
@@ -293,93 +681,82 @@ def main():
                 "date": datetime.now().strftime("%B %d, %Y")
             }
         
-        # Project abstract
-        st.markdown("### Project Abstract")
-        project_abstract = st.text_area(
-            "Enter your project abstract",
-            height=200,
-            help="Provide a comprehensive summary of your project"
-        )
-        
-        # Project specifics to improve content generation
-        with st.expander("Additional Project Details (Improves Generation)"):
-            st.text_area("Key Technologies Used", placeholder="e.g., Arduino Uno, HC-05 Bluetooth, L298N Motor Driver", key="technologies")
-            st.text_area("Project Objectives", placeholder="List main objectives of your project", key="objectives")
-            st.text_area("Project Components", placeholder="List main hardware/software components", key="components")
-        
         # Generate documentation
         if st.button("Generate Documentation", type="primary"):
             if project_abstract:
                 with st.spinner("Generating comprehensive documentation..."):
                     try:
-                        st.session_state.doc_sections = {}
+                        # Collect results locally so a failed run leaves the previous document intact
+                        doc_sections = {}
                         
-                        # Generate each section
-                        for section_key, section_info in SECTIONS.items():
-                            # Skip cover page as it's generated directly
-                            if section_key == 'COVER_PAGE':
-                                continue
-                                
-                            with st.spinner(f"Generating {section_info['title']}..."):
-                                # Use alternating models for different sections
-                                model = groq_model if len(st.session_state.doc_sections) % 2 == 0 else google_model
-                                
-                                # Get additional context if available
-                                technologies = st.session_state.get("technologies", "")
-                                objectives = st.session_state.get("objectives", "")
-                                components = st.session_state.get("components", "")
-                                project_type = st.session_state.metadata.get("project_type", "")
-                                
-                                # Section-specific guidance
-                                section_guidance = ""
-                                if section_key == "CHAPTER_3":
-                                    section_guidance = "Focus on hardware components like Arduino, sensors, and other electronic components. Describe their specifications and roles in detail."
-                                elif section_key == "CHAPTER_4":
-                                    section_guidance = "Explain the programming approach, include pseudocode or algorithm descriptions (not actual code), and detail the software workflow."
-                                elif section_key == "LITERATURE_SURVEY":
-                                    section_guidance = "Review at least 5-7 similar projects or related research papers, mentioning their approaches and results."
-                                
-                                prompt = f"""Generate the {section_info['title']} section for the following {project_type} project:
-                                
-                                Abstract: {project_abstract}
-                                
-                                Section Purpose: {section_info.get('description', '')}
-                                
-                                Additional Context:
-                                - Technologies: {technologies}
-                                - Objectives: {objectives}
-                                - Components: {components}
-                                - {section_guidance}
-                                
-                                Requirements:
-                                1. This section should be approximately {section_info['pages']} pages long (about {section_info['pages'] * 500} words)
-                                2. Use clear, straightforward explanations with appropriate technical depth
-                                3. Organize content with clear sections and subsections
-                                4. For headings, use markdown style with ### for subheadings (e.g., "### Component Analysis")
-                                5. DO NOT use numbered bold headings like "**1. Objective**" - always use ### instead
-                                6. Write in a professional academic style with proper citations where appropriate
-                                7. Use proper paragraph breaks for readability
-                                8. Focus on factual information that would be relevant to this type of project
-                                9. For CHAPTER_2, include descriptions of block diagrams (not the diagrams themselves)
-                                10. Make this content unique, avoiding generic templates
-                                11. Ensure all content is technically accurate and plausible
-                                """
-                                
-                                if section_key == "CONTENTS":
-                                    # Skip generating TOC as it's handled by the function
-                                    st.session_state.doc_sections[section_key] = "TABLE OF CONTENTS"
-                                else:
-                                    response = model.invoke(prompt)
-                                    st.session_state.doc_sections[section_key] = response.content
+                        # Skip generating TOC as it's handled by the function
+                        doc_sections["CONTENTS"] = "TABLE OF CONTENTS"
+                        
+                        # Get additional context if available
+                        context = {
+                            "abstract": project_abstract,
+                            "technologies": st.session_state.get("technologies", ""),
+                            "objectives": st.session_state.get("objectives", ""),
+                            "components": st.session_state.get("components", ""),
+                            "project_type": st.session_state.metadata.get("project_type", "")
+                        }
+                        
+                        # Generate all sections with a single batched request
+                        section_keys = CONTENT_SECTION_KEYS
+                        progress = st.progress(0.0)
+                        preview = st.empty()
+                        previews = {}
+                        try:
+                            batched_sections = asyncio.run(with_stream_previews(
+                                asyncio.to_thread(gen_batched_sections, GROQ_MODEL, context, section_keys, previews.setdefault("BATCH", []).append),
+                                previews,
+                                preview
+                            ))
+                        except TruncatedResponseError as e:
+                            # Keep the sections that were completed before the cut-off;
+                            # the per-section retry covers the rest
+                            batched_sections = split_batched_sections(e.text, section_keys)
+                        doc_sections.update(batched_sections)
+                        
+                        # Track progress as sections actually complete
+                        completed_keys = [k for k in section_keys if k in doc_sections]
+                        progress.progress(len(completed_keys) / len(section_keys))
+                        
+                        def on_section_done(section_key):
+                            completed_keys.append(section_key)
+                            progress.progress(len(completed_keys) / len(section_keys))
+                        
+                        # Retry any sections missing from the batched response concurrently
+                        missing_keys = [k for k in section_keys if k not in doc_sections]
+                        truncated_keys = set()
+                        if missing_keys:
+                            previews.clear()
+                            results = asyncio.run(with_stream_previews(
+                                gen_all_sections(context, missing_keys, on_section_done, previews, truncated_keys.add),
+                                previews,
+                                preview
+                            ))
+                            doc_sections.update(results)
+                        
+                        # Pre-parse sections so document assembly does no string processing
+                        parsed_sections = {
+                            key: parse_section(content) for key, content in doc_sections.items()
+                        }
+                        
+                        # Release the previous document's lxml tree before building a new one
+                        st.session_state.doc_obj = None
+                        gc.collect()
                         
                         # Create DOCX
-                        create_docx(st.session_state.metadata)
-                        st.session_state.has_generated = True
+                        doc_obj = create_docx(st.session_state.metadata, parsed_sections)
                         
-                        # Add progress tracking
-                        progress = st.progress(0)
-                        for i in range(100):
-                            progress.progress(i + 1)
+                        # Replace the previous generation only once the new document is built
+                        st.session_state.doc_sections = doc_sections
+                        st.session_state.parsed_sections = parsed_sections
+                        st.session_state.doc_obj = doc_obj
+                        st.session_state.doc_metadata = dict(st.session_state.metadata)
+                        st.session_state.truncated_sections = truncated_keys
+                        st.session_state.has_generated = True
                         
                         st.success("Documentation generated successfully!")
                         st.rerun()
@@ -387,7 +764,7 @@ def main():
                     except Exception as e:
                         st.error(f"Error generating documentation: {str(e)}")
             else:
-                st.warning("Please enter a project abstract.")
+                st.warning("Please enter and save a project abstract.")
 
     with col2:
         if st.session_state.has_generated:
@@ -396,7 +773,7 @@ def main():
             # Section selection
             selected_section = st.selectbox(
                 "Select section to review",
-                options=[k for k in SECTIONS.keys() if k != "COVER_PAGE" and k != "CONTENTS"],
+                options=CONTENT_SECTION_KEYS,
                 format_func=lambda x: SECTIONS[x]['title']
             )
             
@@ -404,6 +781,8 @@ def main():
                 st.markdown(f"### {SECTIONS[selected_section]['title']}")
                 st.markdown(f"{SECTIONS[selected_section].get('description', '')}")
                 st.markdown("---")
+                if selected_section in st.session_state.truncated_sections:
+                    st.warning("This section hit the length limit and may end abruptly. Submit feedback to regenerate it.")
                 st.markdown(st.session_state.doc_sections.get(selected_section, ""))
                 
                 # Feedback input
@@ -417,33 +796,23 @@ def main():
                     with st.spinner("Updating section..."):
                         try:
                             # Alternate between models for feedback processing
-                            model = google_model if len(st.session_state.feedback_history) % 2 == 0 else groq_model
+                            model_name = GOOGLE_MODEL if st.session_state.feedback_count % 2 == 0 else GROQ_MODEL
                             
-                            prompt = f"""Update the following documentation section based on user feedback:
+                            # Show the updated section as it streams in
+                            previews = {}
+                            updated_content = asyncio.run(with_stream_previews(
+                                asyncio.to_thread(
+                                    refine_section,
+                                    model_name,
+                                    st.session_state.doc_sections[selected_section],
+                                    feedback,
+                                    selected_section,
+                                    previews.setdefault(selected_section, []).append
+                                ),
+                                previews,
+                                st.empty()
+                            ))
                             
-                            Current content:
-                            {st.session_state.doc_sections[selected_section]}
-                            
-                            User feedback:
-                            {feedback}
-                            
-                            Section Purpose: {SECTIONS[selected_section].get('description', '')}
-                            
-                            Requirements:
-                            1. Maintain professional academic writing style
-                            2. Implement the requested changes thoroughly
-                            3. Keep the content within approximately {SECTIONS[selected_section]['pages'] * 500} words
-                            4. Ensure the text remains technically accurate
-                            5. Use proper paragraph structure and organization
-                            6. Ensure content flows logically
-                            7. Use markdown style with ### for subheadings (not bold formatting like **Heading**)
-                            8. Never use formats like "**1. Objective**" - use "### 1. Objective" instead
-                            """
-                            
-                            response = model.invoke(prompt)
-                            
-                            # Update section
-                            updated_content = response.content
                             # Apply same formatting fixes
                             updated_content = updated_content.replace("**1. ", "### 1. ")
                             updated_content = updated_content.replace("**2. ", "### 2. ")
@@ -454,9 +823,20 @@ def main():
                             updated_content = updated_content.replace("**Objectives ", "### Objectives ")
                             
                             st.session_state.doc_sections[selected_section] = updated_content
+                            st.session_state.parsed_sections[selected_section] = parse_section(updated_content)
+                            st.session_state.truncated_sections.discard(selected_section)
                             
-                            # Create updated DOCX
-                            create_docx(st.session_state.metadata)
+                            # Patch only the updated section unless the cover page needs rebuilding
+                            if st.session_state.doc_obj and st.session_state.doc_metadata == st.session_state.metadata:
+                                doc, section_para_ranges = st.session_state.doc_obj
+                                patch_section(doc, selected_section, st.session_state.parsed_sections[selected_section], section_para_ranges)
+                                save_docx(doc)
+                            else:
+                                # Release the previous document's lxml tree before rebuilding it
+                                st.session_state.doc_obj = None
+                                gc.collect()
+                                st.session_state.doc_obj = create_docx(st.session_state.metadata, st.session_state.parsed_sections)
+                                st.session_state.doc_metadata = dict(st.session_state.metadata)
                             
                             # Record feedback
                             st.session_state.feedback_history.append({
@@ -464,6 +844,7 @@ def main():
                                 "feedback": feedback,
                                 "timestamp": datetime.now()
                             })
+                            st.session_state.feedback_count += 1
                             
                             st.success("Section updated successfully!")
                             st.rerun()
@@ -474,13 +855,20 @@ def main():
             # Feedback history
             if st.session_state.feedback_history:
                 with st.expander("Feedback History"):
-                    for entry in reversed(st.session_state.feedback_history):
-                        st.markdown(f"""
-                        *Section:* {entry['section']}  
-                        *Feedback:* {entry['feedback']}  
-                        *Time:* {entry['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}
-                        ---
+                    # Only render the most recent entries unless asked otherwise
+                    entries = list(st.session_state.feedback_history)
+                    if len(entries) > 10 and not st.toggle("Show all feedback", key="show_all_feedback"):
+                        entries = entries[-10:]
+                    
+                    chunks = []
+                    for entry in reversed(entries):
+                        chunks.append(f"""
+                            *Section:* {entry['section']}  
+                            *Feedback:* {entry['feedback']}  
+                            *Time:* {entry['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}
+                            ---
                         """)
+                    st.markdown(''.join(chunks))
             
             # Add document features info
             with st.expander("Document Features & Instructions"):
@@ -501,13 +889,7 @@ def main():
                 """)
             
             # Add download options
-            st.download_button(
-                "📥 Download Documentation",
-                data=open("project_documentation.docx", "rb"),
-                file_name="documentation.docx",
-                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                use_container_width=True
-            )
+            render_download_button("download_bottom")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file